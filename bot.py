@@ -1,6 +1,6 @@
 # bot.py
 # Monitor bot: fetches a website HTML and checks for a keyword (no site changes required).
-# Runs a Flask web service so Render detects a port, stores logs in SQLite,
+# Serves a small aiohttp web app so Render detects a port, stores logs in SQLite,
 # notifies multiple owners via DM, provides /health, /status, /forcecheck, /settings.
 
 from dotenv import load_dotenv
@@ -8,18 +8,30 @@ load_dotenv()  # MUST be first so os.getenv() reads .env when running locally
 
 import os
 import io
+import re
 import json
+import time
+import atexit
 import sqlite3
-import threading
-import urllib.parse
 import asyncio
-from datetime import datetime, timedelta
+import threading
+from collections import deque
+from datetime import datetime
+
+import matplotlib
+matplotlib.use("Agg")  # headless backend; must be set before pyplot-style use
+from matplotlib.figure import Figure
+
+try:
+    import uvloop  # libuv event loop; not available on Windows
+except ImportError:
+    uvloop = None
 
 import aiohttp
+from aiohttp import web
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
-from flask import Flask, jsonify
 
 # ----------------- CONFIG / ENV (Render or .env) -----------------
 BOT_TOKEN = os.getenv("BOT_TOKEN")
@@ -29,9 +41,8 @@ CHECK_URL = os.getenv("CHECK_URL")                 # site to check (must include
 ONLINE_KEYWORD = os.getenv("ONLINE_KEYWORD", "Online")
 CHECK_INTERVAL_MIN = int(os.getenv("CHECK_INTERVAL_MIN", "5"))
 REQUEST_TIMEOUT_S = int(os.getenv("REQUEST_TIMEOUT_S", "10"))
-QUICKCHART_URL = os.getenv("QUICKCHART_URL", "https://quickchart.io/chart")
 DB_PATH = os.getenv("DB_PATH", "monitor.db")
-FLASK_PORT = int(os.getenv("PORT", "3000"))       # Render supplies PORT
+WEB_PORT = int(os.getenv("PORT", "3000"))         # Render supplies PORT
 
 # Basic verification
 if not BOT_TOKEN or not OWNER_USER_IDS or not CHECK_URL:
@@ -42,10 +53,37 @@ if not BOT_TOKEN or not OWNER_USER_IDS or not CHECK_URL:
           "CHECK_URL:", os.getenv("CHECK_URL"))
     raise SystemExit(1)
 
-OWNER_IDS = [int(x.strip()) for x in OWNER_USER_IDS.split(",") if x.strip()]
+# frozenset: O(1) membership checks in the command/interaction gates
+OWNER_IDS = frozenset(int(x.strip()) for x in OWNER_USER_IDS.split(",") if x.strip())
 
 # ----------------- SQLITE (settings, logs, downtimes) -----------------
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+# One connection per thread: the event loop and to_thread workers each get
+# their own handle instead of serializing on a single shared connection's
+# mutex. WAL (below) makes concurrent readers alongside the writer safe.
+_tls = threading.local()
+
+def _apply_pragmas(c):
+    # WAL lets web readers run while the monitor worker writes, and
+    # synchronous=NORMAL drops the per-commit double fsync of the rollback journal.
+    c.executescript("""
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-65536;
+    PRAGMA busy_timeout=3000;
+    """)
+
+def get_conn():
+    c = getattr(_tls, "conn", None)
+    if c is None:
+        # cached_statements keeps the parsed plans for the hot SQL strings alive
+        c = sqlite3.connect(DB_PATH, cached_statements=256)
+        _apply_pragmas(c)
+        _tls.conn = c
+    return c
+
+conn = get_conn()
 cur = conn.cursor()
 
 cur.execute("""
@@ -59,6 +97,15 @@ CREATE TABLE IF NOT EXISTS settings (
 """, (CHECK_INTERVAL_MIN, REQUEST_TIMEOUT_S, ONLINE_KEYWORD))
 
 cur.execute("CREATE TABLE IF NOT EXISTS logs (ts INTEGER, up INTEGER)")
+cur.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs(ts)")
+# per-hour rollup so uptime percentages never rescan the raw logs table
+cur.execute("""
+CREATE TABLE IF NOT EXISTS uptime_buckets (
+  hour_ts INTEGER PRIMARY KEY,
+  up_count INTEGER,
+  total_count INTEGER
+)
+""")
 cur.execute("""
 CREATE TABLE IF NOT EXISTS downtimes (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -68,6 +115,19 @@ CREATE TABLE IF NOT EXISTS downtimes (
 """)
 conn.commit()
 
+# seed the rollup from existing logs on first run with the new schema
+r = cur.execute("SELECT COUNT(*) FROM uptime_buckets").fetchone()
+if r[0] == 0:
+    cur.execute("""
+    INSERT INTO uptime_buckets(hour_ts, up_count, total_count)
+    SELECT (ts / 3600000) * 3600000, SUM(up), COUNT(*) FROM logs GROUP BY 1
+    """)
+    conn.commit()
+
+# refresh planner statistics cheaply at startup (bounded by analysis_limit)
+cur.execute("PRAGMA analysis_limit=1000")
+cur.execute("PRAGMA optimize")
+
 # ensure single settings row exists
 r = cur.execute("SELECT COUNT(*) FROM settings WHERE id=1").fetchone()
 if r is None or r[0] == 0:
@@ -75,161 +135,459 @@ if r is None or r[0] == 0:
                 (CHECK_INTERVAL_MIN, REQUEST_TIMEOUT_S, ONLINE_KEYWORD))
     conn.commit()
 
+# conn.execute reuses an internal cursor, so no cursor object churn per call
 def db_get(q, params=()):
-    c = conn.cursor()
-    c.execute(q, params)
-    return c.fetchone()
+    return get_conn().execute(q, params).fetchone()
 
 def db_all(q, params=()):
-    c = conn.cursor()
-    c.execute(q, params)
-    return c.fetchall()
+    return get_conn().execute(q, params).fetchall()
 
 def db_run(q, params=()):
-    c = conn.cursor()
-    c.execute(q, params)
-    conn.commit()
-    return c
+    # "with conn" opens an implicit transaction and commits once on exit
+    c = get_conn()
+    with c:
+        return c.execute(q, params)
+
+# settings change only via update_setting, so cache the row in memory;
+# the lock keeps refills and invalidations sane across to_thread workers
+_settings_cache = None
+_settings_lock = threading.RLock()
 
 def get_settings():
-    row = db_get("SELECT interval_min, timeout_s, response_keyword, channel_id FROM settings WHERE id=1")
-    return {
-        "interval_min": row[0],
-        "timeout_s": row[1],
-        "response_keyword": row[2],
-        "channel_id": row[3]
-    }
+    global _settings_cache
+    with _settings_lock:
+        if _settings_cache is None:
+            row = db_get("SELECT interval_min, timeout_s, response_keyword, channel_id FROM settings WHERE id=1")
+            _settings_cache = {
+                "interval_min": row[0],
+                "timeout_s": row[1],
+                "response_keyword": row[2],
+                "channel_id": row[3]
+            }
+        return _settings_cache
+
+# set whenever settings change so the monitor worker can wake early
+_settings_changed = asyncio.Event()
 
 def update_setting(field, value):
+    global _settings_cache
     if field not in ("interval_min","timeout_s","response_keyword","channel_id"):
         raise ValueError("bad field")
     db_run(f"UPDATE settings SET {field}=? WHERE id=1", (value,))
+    with _settings_lock:
+        # write through rather than invalidate: the next reader skips the refill SELECT
+        if _settings_cache is not None:
+            _settings_cache = {**_settings_cache, field: value}
+    # update_setting runs via to_thread and asyncio.Event isn't thread-safe:
+    # hand the set() to the loop so the waiting monitor worker wakes promptly
+    bot.loop.call_soon_threadsafe(_settings_changed.set)
+
+# Buffer writes and flush them in one transaction so steady-state checks
+# don't pay an fsync each. Transitions and reads force a flush to stay exact.
+#
+# Every tick is time-weighted into the per-hour rollup, but a raw logs row is only
+# kept on state changes plus an hourly heartbeat — a stable service writes
+# O(transitions) rows instead of one per tick.
+_pending_logs = deque()
+_pending_counts = {}
+LOG_FLUSH_THRESHOLD = 16
+HEARTBEAT_MS = 3600 * 1000
+
+# mutators run on to_thread executor threads, so buffer access needs the same
+# guard the settings cache has; RLock because insert_log flushes while holding it
+_log_lock = threading.RLock()
+
+_last_logged_up = None
+_last_logged_ts = 0
+_row = cur.execute("SELECT ts, up FROM logs ORDER BY ts DESC LIMIT 1").fetchone()
+if _row:
+    _last_logged_ts, _last_logged_up = _row
+
+# end of the span covered by the previous check; rollup counts are weighted
+# by elapsed seconds so uptime stays time-true when backoff stretches the
+# down-period cadence (count-per-tick would read a 6h outage as ~97% up)
+_last_tick_ms = None
 
 def insert_log(ts_ms, up):
-    db_run("INSERT INTO logs(ts, up) VALUES (?, ?)", (ts_ms, up))
-
-def start_downtime(start_ts):
-    db_run("INSERT INTO downtimes(start_ts, end_ts) VALUES (?, NULL)", (start_ts,))
-
-def end_last_downtime(end_ts):
-    db_run("UPDATE downtimes SET end_ts=? WHERE id=(SELECT id FROM downtimes ORDER BY id DESC LIMIT 1)", (end_ts,))
+    global _last_logged_up, _last_logged_ts, _last_tick_ms
+    with _log_lock:
+        span_start = _last_tick_ms if _last_tick_ms is not None and _last_tick_ms < ts_ms else ts_ms - 1000
+        _last_tick_ms = ts_ms
+        # attribute the span to each hour bucket it overlaps, so an hour the
+        # backed-off probe skipped is still covered (not defaulted to 100%)
+        t = span_start
+        while t < ts_ms:
+            h = t - t % 3600000
+            seg_end = min(h + 3600000, ts_ms)
+            w = max(1, (seg_end - t) // 1000)
+            b = _pending_counts.setdefault(h, [0, 0])
+            b[0] += w * up
+            b[1] += w
+            t = seg_end
+        if up != _last_logged_up or ts_ms - _last_logged_ts >= HEARTBEAT_MS:
+            _pending_logs.append((ts_ms, up))
+            _last_logged_up = up
+            _last_logged_ts = ts_ms
+        if len(_pending_logs) >= LOG_FLUSH_THRESHOLD:
+            flush_logs()
+
+def _flush_pending(c):
+    # caller owns the transaction and holds _log_lock
+    if _pending_logs:
+        c.executemany("INSERT INTO logs(ts, up) VALUES (?, ?)", list(_pending_logs))
+    if _pending_counts:
+        c.executemany("""
+        INSERT INTO uptime_buckets(hour_ts, up_count, total_count) VALUES (?, ?, ?)
+        ON CONFLICT(hour_ts) DO UPDATE SET
+          up_count = up_count + excluded.up_count,
+          total_count = total_count + excluded.total_count
+        """, [(h, b[0], b[1]) for h, b in _pending_counts.items()])
+    _pending_logs.clear()
+    _pending_counts.clear()
+
+def flush_logs():
+    with _log_lock:
+        if not _pending_logs and not _pending_counts:
+            return
+        c = get_conn()
+        with c:
+            _flush_pending(c)
+
+# don't lose buffered rows on a clean shutdown/redeploy
+atexit.register(flush_logs)
+
+# id of the still-open downtime row, so closing it is a keyed single-row
+# update instead of a correlated subquery. Seeded from the DB at startup.
+_open_downtime_id = None
+_row = cur.execute("SELECT id FROM downtimes WHERE end_ts IS NULL ORDER BY id DESC LIMIT 1").fetchone()
+if _row:
+    _open_downtime_id = _row[0]
+
+def record_transition(ts_ms, up):
+    """Commit buffered rows and the downtime edge in a single transaction."""
+    global _open_downtime_id
+    c = get_conn()
+    with _log_lock, c:
+        _flush_pending(c)
+        if up:
+            if _open_downtime_id is not None:
+                c.execute("UPDATE downtimes SET end_ts=? WHERE id=?", (ts_ms, _open_downtime_id))
+                _open_downtime_id = None
+        else:
+            _open_downtime_id = c.execute(
+                "INSERT INTO downtimes(start_ts, end_ts) VALUES (?, NULL)", (ts_ms,)).lastrowid
 
 def get_last_downtime():
     return db_get("SELECT start_ts, end_ts FROM downtimes ORDER BY id DESC LIMIT 1")
 
-def logs_since(ms_since):
-    return db_all("SELECT ts, up FROM logs WHERE ts >= ? ORDER BY ts ASC", (ms_since,))
-
-# ----------------- Flask for Render port detection & lightweight API -----------------
-flask_app = Flask("monitor_web")
+def last_snapshot():
+    # raw rows are edge-only now, so prefer the in-memory last check; the
+    # indexed DB read remains for the window before the first check runs
+    if OBSERVED_STATUS["last_check_ts"]:
+        return (OBSERVED_STATUS["last_check_ts"], 1 if OBSERVED_STATUS["online"] else 0)
+    flush_logs()
+    return db_get("SELECT ts, up FROM logs ORDER BY ts DESC LIMIT 1")
+
+# the same incident is rendered by /status, /health and both forcecheck
+# paths; strftime('%c') goes through libc, so memoize per (start, end) pair
+_incident_fmt_cache = {}
+
+def format_last_incident(last_inc):
+    if not last_inc:
+        return "No incidents"
+    key = tuple(last_inc)
+    rendered = _incident_fmt_cache.get(key)
+    if rendered is None:
+        s_ts, e_ts = last_inc
+        rendered = datetime.fromtimestamp(s_ts/1000).strftime('%c')
+        rendered += f" → {datetime.fromtimestamp(e_ts/1000).strftime('%c')}" if e_ts else " (ongoing)"
+        if len(_incident_fmt_cache) > 64:
+            _incident_fmt_cache.clear()
+        _incident_fmt_cache[key] = rendered
+    return rendered
+
+# ----------------- aiohttp web app for Render port detection & lightweight API -----------------
+# Served on the bot's own event loop: no extra thread, no cross-thread SQLite access.
 OBSERVED_STATUS = {"online": False, "last_check_ts": None}
 
-@flask_app.route("/")
-def index():
-    s = get_settings()
-    return jsonify({
-        "service": "maxy-monitor",
-        "observed_online": OBSERVED_STATUS["online"],
-        "last_check": datetime.utcfromtimestamp(OBSERVED_STATUS["last_check_ts"]/1000).isoformat()+"Z" if OBSERVED_STATUS["last_check_ts"] else None,
-        "settings": s
-    })
-
-@flask_app.route("/_health")
-def health():
-    return "ok", 200
-
-def run_flask():
-    flask_app.run(host="0.0.0.0", port=FLASK_PORT, debug=False, use_reloader=False)
+# Render probes / frequently; serve pre-serialized bytes behind a short TTL
+# so the steady-state probe path does no dict building or JSON encoding.
+_index_cache = (b"", 0.0)
+
+async def web_index(request):
+    global _index_cache
+    body, expires = _index_cache
+    now = time.monotonic()
+    if now >= expires:
+        s = await asyncio.to_thread(get_settings)
+        body = json.dumps({
+            "service": "maxy-monitor",
+            "observed_online": OBSERVED_STATUS["online"],
+            "last_check": datetime.utcfromtimestamp(OBSERVED_STATUS["last_check_ts"]/1000).isoformat()+"Z" if OBSERVED_STATUS["last_check_ts"] else None,
+            "settings": s
+        }).encode()
+        _index_cache = (body, now + 1.0)
+    return web.Response(body=body, content_type="application/json")
+
+async def web_health(request):
+    return web.Response(text="ok")
+
+web_runner = None
+
+async def start_web_app():
+    global web_runner
+    if web_runner is not None:
+        return
+    app = web.Application()
+    app.router.add_get("/", web_index)
+    app.router.add_get("/_health", web_health)
+    web_runner = web.AppRunner(app)
+    await web_runner.setup()
+    await web.TCPSite(web_runner, "0.0.0.0", WEB_PORT).start()
+    print(f"Web app listening on port {WEB_PORT}")
 
 # ----------------- Discord bot (intents first) -----------------
 intents = discord.Intents.default()
 # set to True to silence the "privileged intent missing" warning; safe if you need message content
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
 
+class MonitorBot(commands.Bot):
+    async def close(self):
+        global HTTP_SESSION
+        if HTTP_SESSION is not None and not HTTP_SESSION.closed:
+            await HTTP_SESSION.close()
+        await super().close()
+
+bot = MonitorBot(command_prefix="!", intents=intents)
+
+# Seed the observed state from the DB so a redeploy doesn't look like a
+# fresh transition and fire a spurious ONLINE/OFFLINE DM.
 observed_status = None   # "online" or "offline"
 downtime_start = None
+if _last_logged_up is not None:
+    observed_status = "online" if _last_logged_up == 1 else "offline"
+if _open_downtime_id is not None:
+    _row = cur.execute("SELECT start_ts FROM downtimes WHERE id=?", (_open_downtime_id,)).fetchone()
+    if _row:
+        downtime_start = _row[0]
 
 # ---------- HTTP helper ----------
-async def fetch_text(url, timeout_s):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, timeout=timeout_s) as resp:
-            text = await resp.text()
-            return resp.status, text
+# One session for the lifetime of the bot: keep-alive + pooled connections
+# instead of a fresh TCP+TLS handshake on every check and chart render.
+HTTP_SESSION = None
+
+async def get_http_session():
+    global HTTP_SESSION
+    if HTTP_SESSION is None or HTTP_SESSION.closed:
+        HTTP_SESSION = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_S),
+            connector=aiohttp.TCPConnector(limit=20, limit_per_host=10,
+                                           keepalive_timeout=75, ttl_dns_cache=300))
+    return HTTP_SESSION
+
+async def fetch_and_scan(url, timeout_s, pat, needle_len):
+    """Stream the page in chunks and stop as soon as the keyword matches.
+
+    Only an 8 KB window (plus a needle-sized carry for matches straddling
+    chunk boundaries) is ever held, and the connection is dropped early
+    when the keyword appears near the top of the page.
+    """
+    session = await get_http_session()
+    async with session.get(url, timeout=timeout_s) as resp:
+        carry = b""
+        async for chunk in resp.content.iter_chunked(8192):
+            if pat.search(carry + chunk):
+                return resp.status, True
+            # keep the tail of carry+chunk, not just chunk: iter_chunked can
+            # yield reads shorter than the needle on slow networks
+            carry = (carry + chunk)[-(needle_len - 1):] if needle_len > 1 else b""
+        return resp.status, False
 
 # ---------- notify owners ----------
+# fetch_user is a REST round trip; User objects are stable, so cache them
+_owner_user_cache = {}
+
+async def get_owner_user(uid):
+    user = _owner_user_cache.get(uid) or bot.get_user(uid)
+    if user is None:
+        user = await bot.fetch_user(uid)
+    _owner_user_cache[uid] = user
+    return user
+
 async def notify_owners_dm(content: str, file_bytes: bytes = None, filename: str = "chart.png"):
-    for uid in OWNER_IDS:
-        try:
-            user = await bot.fetch_user(uid)
-            if file_bytes:
-                bio = io.BytesIO(file_bytes)
-                bio.seek(0)
-                await user.send(content, file=discord.File(bio, filename=filename))
-            else:
-                await user.send(content)
-        except discord.Forbidden:
+    async def send_one(uid):
+        user = await get_owner_user(uid)
+        if file_bytes:
+            # discord.File consumes its stream, so each send needs a fresh
+            # BytesIO; the underlying bytes object is shared, not copied
+            await user.send(content, file=discord.File(io.BytesIO(file_bytes), filename=filename))
+        else:
+            await user.send(content)
+
+    # fan out concurrently: total latency is the slowest owner, not the sum
+    results = await asyncio.gather(*(send_one(uid) for uid in OWNER_IDS), return_exceptions=True)
+    for uid, res in zip(OWNER_IDS, results):
+        if isinstance(res, discord.Forbidden):
             print(f"[WARN] Cannot DM {uid} - forbidden (user DMs disabled or blocked bot)")
+        elif isinstance(res, Exception):
+            print(f"[WARN] Failed to DM {uid}: {res}")
+
+# Bounded queue + one consumer instead of fire-and-forget create_task: a
+# flapping monitor can't pile up unowned tasks, and overflow drops with a log.
+NOTIFY_QUEUE = asyncio.Queue(maxsize=64)
+_notify_consumer_task = None
+
+def queue_notify(content, file_bytes=None, filename="chart.png"):
+    try:
+        NOTIFY_QUEUE.put_nowait((content, file_bytes, filename))
+    except asyncio.QueueFull:
+        print("[WARN] Notify queue full; dropping notification")
+
+async def notify_consumer():
+    while True:
+        content, file_bytes, filename = await NOTIFY_QUEUE.get()
+        try:
+            await notify_owners_dm(content, file_bytes=file_bytes, filename=filename)
         except Exception as e:
-            print(f"[WARN] Failed to DM {uid}: {e}")
+            print("[WARN] Notify consumer error:", e)
+        finally:
+            NOTIFY_QUEUE.task_done()
 
 # ---------- uptime helpers ----------
-def uptime_percent(hours: int):
-    now_ms = int(datetime.utcnow().timestamp() * 1000)
-    since_ms = now_ms - (hours * 3600 * 1000)
-    rows = logs_since(since_ms)
-    if not rows:
-        return 100.0
-    total = len(rows)
-    up = sum(r[1] for r in rows)
-    return round((up / total) * 100, 2)
-
-# ---------- QuickChart builder ----------
-async def build_quickchart_png(labels, values):
-    cfg = {
-        "type":"line",
-        "data":{"labels":labels,"datasets":[{"label":"Uptime %","data":values,"fill":True,"borderColor":"#39d353","backgroundColor":"rgba(57,211,83,0.08)"}]},
-        "options":{"scales":{"y":{"min":0,"max":100}},"plugins":{"legend":{"display":False}}}
-    }
-    q = urllib.parse.quote_plus(json.dumps(cfg, separators=(",",":")))
-    url = f"{QUICKCHART_URL}?c={q}&format=png&width=800&height=300"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            if resp.status != 200:
-                raise Exception(f"QuickChart error {resp.status}")
-            return await resp.read()
+def now_ms():
+    # one C call, no datetime allocation — used on every tick and log row
+    return time.time_ns() // 1_000_000
+
+def uptime_percents():
+    """Return (24h, 7d, 30d) uptime percentages from one pass over the rollup."""
+    flush_logs()
+    ms = now_ms()
+    cut24 = ms - 24 * 3600 * 1000
+    cut7 = ms - 7 * 24 * 3600 * 1000
+    cut30 = ms - 30 * 24 * 3600 * 1000
+    cut24 -= cut24 % 3600000
+    cut7 -= cut7 % 3600000
+    cut30 -= cut30 % 3600000
+    row = db_get("""
+    SELECT
+      SUM(CASE WHEN hour_ts >= ?1 THEN up_count END) * 100.0
+        / NULLIF(SUM(CASE WHEN hour_ts >= ?1 THEN total_count END), 0),
+      SUM(CASE WHEN hour_ts >= ?2 THEN up_count END) * 100.0
+        / NULLIF(SUM(CASE WHEN hour_ts >= ?2 THEN total_count END), 0),
+      SUM(up_count) * 100.0 / NULLIF(SUM(total_count), 0)
+    FROM uptime_buckets WHERE hour_ts >= ?3
+    """, (cut24, cut7, cut30))
+    if row is None:
+        return 100.0, 100.0, 100.0
+    return tuple(100.0 if v is None else round(v, 2) for v in row)
+
+def build_buckets_24h():
+    """Labels and per-hour uptime values for the last 24 hours (sync, DB-bound)."""
+    flush_logs()
+    ms = now_ms()
+    cur_hour = ms - ms % 3600000
+    rows = db_all(
+        "SELECT hour_ts, up_count, total_count FROM uptime_buckets WHERE hour_ts >= ?",
+        (cur_hour - 23 * 3600000,))
+    by_hour = {h: round((u / t) * 100, 2) for h, u, t in rows if t}
+    labels = []
+    values = []
+    for i in range(23, -1, -1):
+        h = cur_hour - i * 3600000
+        # buckets are hour-aligned UTC, so the label is plain arithmetic —
+        # no libc strftime call per tick mark
+        labels.append(f"{(h // 3600000) % 24:02d}:00")
+        values.append(by_hour.get(h, 100))
+    return labels, values
+
+# ---------- chart builder ----------
+# Rendered in-process with matplotlib's Agg backend: no HTTPS round trip to a
+# chart service, and /health still works when outbound network is flaky.
+_chart_fig = Figure(figsize=(8, 3), dpi=100)
+
+def build_chart_png(labels, values):
+    _chart_fig.clf()
+    ax = _chart_fig.add_subplot(111)
+    xs = range(len(values))
+    ax.plot(xs, values, color="#39d353")
+    ax.fill_between(xs, values, color="#39d353", alpha=0.08)
+    ax.set_ylim(0, 100)
+    ax.set_ylabel("Uptime %")
+    ax.set_xticks(list(xs))
+    ax.set_xticklabels(labels, rotation=45, fontsize=7)
+    _chart_fig.tight_layout()
+    bio = io.BytesIO()
+    _chart_fig.savefig(bio, format="png")
+    return bio.getvalue()
+
+# repeat /health calls render the same buckets, so reuse the PNG until the
+# data actually changes — the current-hour bucket moves on every tick, so
+# keying on the values (not just the hour) keeps the chart in step with the
+# embed text during a mid-hour outage. Rendering runs on to_thread executor
+# threads and matplotlib (and the shared Figure) is not thread-safe, so the
+# whole check-and-render is serialized.
+_chart_cache = {"key": None, "png": None}
+_chart_lock = threading.Lock()
+
+def chart_png_for_hour(labels, values, hour_key):
+    key = (hour_key, tuple(values))
+    with _chart_lock:
+        if _chart_cache["key"] != key:
+            _chart_cache["png"] = build_chart_png(labels, values)
+            _chart_cache["key"] = key
+        return _chart_cache["png"]
 
 # ---------- core check ----------
+# compiled per keyword value so the page body is scanned in place, without
+# materializing a lower-cased copy of the whole document every tick
+_keyword_re_cache = {}
+
+def keyword_pattern(keyword):
+    # bytes pattern: IGNORECASE is ASCII-only here, which matches the kind of
+    # "Online" marker this bot looks for
+    pat = _keyword_re_cache.get(keyword)
+    if pat is None:
+        pat = _keyword_re_cache.setdefault(keyword, re.compile(re.escape(keyword).encode(), re.IGNORECASE))
+    return pat
+
+# serializes the worker's scheduled checks with /forcecheck so two call
+# sites never hit the target site (or flip state) concurrently
+_check_lock = asyncio.Lock()
+
 async def run_check_once():
+    async with _check_lock:
+        return await _run_check_locked()
+
+async def _run_check_locked():
     global observed_status, downtime_start, OBSERVED_STATUS
     s = get_settings()
     keyword = (s["response_keyword"] or ONLINE_KEYWORD).strip()
     timeout = int(s["timeout_s"] or REQUEST_TIMEOUT_S)
     try:
-        status_code, page_text = await fetch_text(CHECK_URL, timeout)
-        found = keyword.lower() in page_text.lower()
+        status_code, found = await fetch_and_scan(
+            CHECK_URL, timeout, keyword_pattern(keyword), len(keyword.encode()))
     except Exception as e:
         print("Fetch error:", e)
         found = False
 
-    ts_ms = int(datetime.utcnow().timestamp() * 1000)
-    insert_log(ts_ms, 1 if found else 0)
+    ts_ms = now_ms()
+    # the append is cheap but may trigger a batched flush, so keep it off the loop
+    await asyncio.to_thread(insert_log, ts_ms, 1 if found else 0)
 
     OBSERVED_STATUS["online"] = bool(found)
     OBSERVED_STATUS["last_check_ts"] = ts_ms
 
     if found:
         if observed_status != "online":
-            # recovery
+            # recovery: buffered rows and the downtime close commit together
+            await asyncio.to_thread(record_transition, ts_ms, 1)
             if downtime_start:
-                end_ts = ts_ms
-                end_last_downtime(end_ts)
-                downtime_secs = (end_ts - downtime_start) // 1000
+                downtime_secs = (ts_ms - downtime_start) // 1000
                 downtime_start = None
                 notify_msg = f"✅ Maxy BACK ONLINE — downtime {downtime_secs}s\n{CHECK_URL}"
             else:
                 notify_msg = f"✅ Maxy ONLINE\n{CHECK_URL}"
-            asyncio.create_task(notify_owners_dm(notify_msg))
+            queue_notify(notify_msg)
             print("Owners notified: ONLINE")
         observed_status = "online"
         return True, "ONLINE", ts_ms
@@ -237,23 +595,69 @@ async def run_check_once():
         if observed_status != "offline":
             observed_status = "offline"
             downtime_start = ts_ms
-            start_downtime(downtime_start)
+            await asyncio.to_thread(record_transition, ts_ms, 0)
             notify_msg = f"🔴 Maxy OFFLINE (keyword not found)\n{CHECK_URL}"
-            asyncio.create_task(notify_owners_dm(notify_msg))
+            queue_notify(notify_msg)
             print("Owners notified: OFFLINE")
         return False, "OFFLINE", ts_ms
 
 # ---------- monitor worker ----------
+# nothing reads raw rows or buckets older than the 30-day window; keep a
+# little slack so the sweep never races the window edge
+RETENTION_MS = 45 * 24 * 3600 * 1000
+
+def prune_old_rows():
+    cutoff = now_ms() - RETENTION_MS
+    c = get_conn()
+    with c:
+        c.execute("DELETE FROM logs WHERE ts < ?", (cutoff,))
+        c.execute("DELETE FROM uptime_buckets WHERE hour_ts < ?", (cutoff,))
+
+_db_maintenance_task = None
+
+async def db_maintenance_worker():
+    # weekly retention sweep + stats refresh keeps queries flat as the DB ages
+    await bot.wait_until_ready()
+    while True:
+        await asyncio.sleep(7 * 24 * 3600)
+        try:
+            await asyncio.to_thread(prune_old_rows)
+            await asyncio.to_thread(db_run, "PRAGMA optimize")
+        except Exception as e:
+            print("DB maintenance error:", e)
+
 async def monitor_worker():
     await bot.wait_until_ready()
+    loop = asyncio.get_running_loop()
+    next_deadline = loop.time()
+    consecutive_failures = 0
     while True:
+        interval_min = CHECK_INTERVAL_MIN
         try:
-            s = get_settings()
-            interval_min = max(1, int(s["interval_min"]))
-            await run_check_once()
+            interval_min = max(1, int(get_settings()["interval_min"]))
+            is_online, _, _ = await run_check_once()
+            consecutive_failures = 0 if is_online else consecutive_failures + 1
         except Exception as e:
             print("Monitor worker error:", e)
-        await asyncio.sleep(interval_min * 60)
+            consecutive_failures += 1
+        # fixed cadence: schedule from the previous deadline, not "now", so a
+        # slow fetch doesn't push every later check further out. While the
+        # target stays down, back off exponentially so a dead endpoint isn't
+        # polled at full rate forever — capped at an hour (which bounds how
+        # late recovery is noticed) and never below the configured cadence,
+        # so a failing target isn't polled *faster* when interval_min > 60.
+        delay = interval_min * 60
+        if consecutive_failures:
+            delay = min(delay * (2 ** min(consecutive_failures, 6)), max(3600, delay))
+        next_deadline += delay
+        sleep_for = max(0.0, next_deadline - loop.time())
+        try:
+            # sleep until the deadline, but wake immediately if settings change
+            await asyncio.wait_for(_settings_changed.wait(), timeout=sleep_for)
+            _settings_changed.clear()
+            next_deadline = loop.time()  # re-anchor the cadence on the new interval
+        except asyncio.TimeoutError:
+            pass
 
 # ---------- Discord interactive UI (modals & view) ----------
 from discord.ui import View, Button, Modal, TextInput
@@ -270,12 +674,12 @@ class EditModal(Modal):
         if self.field in ("interval_min","timeout_s"):
             try:
                 valn = int(val)
-                update_setting(self.field, valn)
             except:
                 await interaction.response.send_message("Invalid number", ephemeral=True)
                 return
+            await asyncio.to_thread(update_setting, self.field, valn)
         else:
-            update_setting(self.field, val)
+            await asyncio.to_thread(update_setting, self.field, val)
         await interaction.response.send_message(f"Saved {self.field} = {val}", ephemeral=True)
 
 class SettingsView(View):
@@ -304,37 +708,46 @@ class SettingsView(View):
         lines = [f"{k}: {v}" for k,v in s.items()]
         await interaction.response.send_message("Current settings:\n" + "\n".join(lines), ephemeral=True)
 
+# ---------- shared status payload ----------
+# /status and /health recompute the same numbers; a short TTL collapses
+# spam-clicks into one DB pass without making the figures noticeably stale
+_status_payload_cache = (None, 0.0)
+STATUS_PAYLOAD_TTL_S = 15.0
+
+async def build_status_payload():
+    global _status_payload_cache
+    payload, expires = _status_payload_cache
+    now = time.monotonic()
+    if payload is None or now >= expires:
+        u24, u7, u30 = await asyncio.to_thread(uptime_percents)
+        last_inc = await asyncio.to_thread(get_last_downtime)
+        snap = await asyncio.to_thread(last_snapshot)
+        if snap:
+            last_check = datetime.fromtimestamp(snap[0]/1000).strftime('%c')
+            last_up = "ONLINE" if snap[1] == 1 else "OFFLINE"
+        else:
+            last_check = "N/A"; last_up = "N/A"
+        payload = {
+            "u24": u24, "u7": u7, "u30": u30,
+            "last_inc_str": format_last_incident(last_inc),
+            "last_check": last_check,
+            "last_up": last_up,
+        }
+        _status_payload_cache = (payload, now + STATUS_PAYLOAD_TTL_S)
+    return payload
+
 # ---------- Slash commands ----------
 @bot.tree.command(name="health", description="Show Maxy health (chart + text).")
 async def health(interaction: discord.Interaction):
     await interaction.response.defer()
     try:
-        u24 = uptime_percent(24)
-        u7 = uptime_percent(24*7)
-        u30 = uptime_percent(24*30)
-        last_inc = get_last_downtime()
-        if last_inc:
-            s_ts, e_ts = last_inc
-            last_inc_str = f"{datetime.fromtimestamp(s_ts/1000).strftime('%c')}" + (f" → {datetime.fromtimestamp(e_ts/1000).strftime('%c')}" if e_ts else " (ongoing)")
-        else:
-            last_inc_str = "No incidents"
-
-        now = datetime.utcnow()
-        labels = []
-        values = []
-        for i in range(23, -1, -1):
-            end = now - timedelta(hours=i)
-            labels.append(end.strftime("%H:%M"))
-            start_ms = int((end - timedelta(hours=1)).timestamp() * 1000)
-            end_ms = int(end.timestamp() * 1000)
-            rows = db_all("SELECT up FROM logs WHERE ts >= ? AND ts < ?", (start_ms, end_ms))
-            if not rows:
-                values.append(100)
-            else:
-                total = len(rows); upcount = sum(r[0] for r in rows)
-                values.append(round((upcount/total) * 100, 2))
+        p = await build_status_payload()
+        u24, u7, u30 = p["u24"], p["u7"], p["u30"]
+        last_inc_str = p["last_inc_str"]
 
-        chart_png = await build_quickchart_png(labels, values)
+        labels, values = await asyncio.to_thread(build_buckets_24h)
+        # PNG encoding takes tens of ms; keep it off the gateway's loop
+        chart_png = await asyncio.to_thread(chart_png_for_hour, labels, values, now_ms() // 3600000)
         text = f"Maxy health\n24h: {u24}% • 7d: {u7}% • 30d: {u30}%\n{last_inc_str}"
         file = discord.File(io.BytesIO(chart_png), filename="health.png")
         embed = discord.Embed(title="Maxy Health", description=text)
@@ -349,29 +762,15 @@ async def health(interaction: discord.Interaction):
 async def status(interaction: discord.Interaction):
     await interaction.response.defer()
     try:
-        u24 = uptime_percent(24)
-        u7 = uptime_percent(24*7)
-        u30 = uptime_percent(24*30)
-        last_inc = get_last_downtime()
-        if last_inc:
-            s_ts, e_ts = last_inc
-            last_inc_str = f"{datetime.fromtimestamp(s_ts/1000).strftime('%c')}" + (f" → {datetime.fromtimestamp(e_ts/1000).strftime('%c')}" if e_ts else " (ongoing)")
-        else:
-            last_inc_str = "No incidents"
-        last_row = db_all("SELECT ts, up FROM logs ORDER BY ts DESC LIMIT 1")
-        if last_row:
-            last_check = datetime.fromtimestamp(last_row[0][0]/1000).strftime('%c')
-            last_up = "ONLINE" if last_row[0][1] == 1 else "OFFLINE"
-        else:
-            last_check = "N/A"; last_up = "N/A"
-        color = discord.Color.green() if last_up == "ONLINE" else discord.Color.red()
+        p = await build_status_payload()
+        color = discord.Color.green() if p["last_up"] == "ONLINE" else discord.Color.red()
         embed = discord.Embed(title="Maxy Quick Status", color=color)
-        embed.add_field(name="Current", value=last_up, inline=True)
-        embed.add_field(name="Last checked", value=last_check, inline=True)
-        embed.add_field(name="24h", value=f"{u24}%", inline=True)
-        embed.add_field(name="7d", value=f"{u7}%", inline=True)
-        embed.add_field(name="30d", value=f"{u30}%", inline=True)
-        embed.add_field(name="Last incident", value=last_inc_str, inline=False)
+        embed.add_field(name="Current", value=p["last_up"], inline=True)
+        embed.add_field(name="Last checked", value=p["last_check"], inline=True)
+        embed.add_field(name="24h", value=f"{p['u24']}%", inline=True)
+        embed.add_field(name="7d", value=f"{p['u7']}%", inline=True)
+        embed.add_field(name="30d", value=f"{p['u30']}%", inline=True)
+        embed.add_field(name="Last incident", value=p["last_inc_str"], inline=False)
         await interaction.followup.send(embed=embed)
     except Exception as e:
         print("status error:", e)
@@ -402,12 +801,8 @@ async def forcecheck(interaction: discord.Interaction):
         embed = discord.Embed(title="Force Check Result", color=color)
         embed.add_field(name="Status", value=("ONLINE" if is_online else "OFFLINE"), inline=True)
         embed.add_field(name="Checked at", value=last_check, inline=True)
-        last_inc = get_last_downtime()
-        if last_inc:
-            s_ts, e_ts = last_inc
-            last_inc_str = f"{datetime.fromtimestamp(s_ts/1000).strftime('%c')}" + (f" → {datetime.fromtimestamp(e_ts/1000).strftime('%c')}" if e_ts else " (ongoing)")
-        else:
-            last_inc_str = "No incidents"
+        last_inc = await asyncio.to_thread(get_last_downtime)
+        last_inc_str = format_last_incident(last_inc)
         embed.add_field(name="Last incident", value=last_inc_str, inline=False)
         await interaction.followup.send(embed=embed, ephemeral=True)
     except Exception as e:
@@ -436,19 +831,17 @@ async def forcecheck_cmd(ctx):
     embed = discord.Embed(title="Force Check Result", color=color)
     embed.add_field(name="Status", value=("ONLINE" if is_online else "OFFLINE"), inline=True)
     embed.add_field(name="Checked at", value=last_check, inline=True)
-    last_inc = get_last_downtime()
-    if last_inc:
-        s_ts, e_ts = last_inc
-        last_inc_str = f"{datetime.fromtimestamp(s_ts/1000).strftime('%c')}" + (f" → {datetime.fromtimestamp(e_ts/1000).strftime('%c')}" if e_ts else " (ongoing)")
-    else:
-        last_inc_str = "No incidents"
+    last_inc = await asyncio.to_thread(get_last_downtime)
+    last_inc_str = format_last_incident(last_inc)
     embed.add_field(name="Last incident", value=last_inc_str, inline=False)
     await ctx.send(embed=embed)
 
 # ---------- on_ready: force guild sync (if provided) & start monitor ----------
 @bot.event
 async def on_ready():
-    print(f"Bot ready: {bot.user} Owners: {OWNER_IDS}")
+    print(f"Bot ready: {bot.user} Owners: {sorted(OWNER_IDS)}")
+    await get_http_session()  # bind the shared session to the running loop
+    await start_web_app()
     try:
         if GUILD_ID:
             try:
@@ -464,10 +857,16 @@ async def on_ready():
             print("Synced global commands")
     except Exception as e:
         print("Slash sync failed:", e)
+    global _notify_consumer_task, _db_maintenance_task
+    if _notify_consumer_task is None:
+        _notify_consumer_task = bot.loop.create_task(notify_consumer())
     bot.loop.create_task(monitor_worker())
+    # on_ready fires again on reconnect; don't stack duplicate weekly loops
+    if _db_maintenance_task is None:
+        _db_maintenance_task = bot.loop.create_task(db_maintenance_worker())
 
-# ---------- start Flask thread and run bot ----------
+# ---------- run bot (web app starts on the bot's loop in on_ready) ----------
 if __name__ == "__main__":
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
-    flask_thread.start()
+    if uvloop is not None:
+        uvloop.install()
     bot.run(BOT_TOKEN)